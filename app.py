@@ -3,7 +3,7 @@ from __future__ import annotations
 import hashlib
 import os
 import tempfile
-from typing import List, Optional
+from typing import List, Optional, Set, Tuple
 
 import pandas as pd
 import plotly.express as px
@@ -11,21 +11,52 @@ import requests
 import streamlit as st
 
 from finance_analysis import (
+    FinanceParseResult,
     advanced_summary,
     aggregate_finance,
     category_breakdown,
+    load_parse_result,
     parse_finance_request,
     parse_financial_tables,
     pie_breakdown,
+    save_parse_result,
     top_transactions,
     totals,
 )
-from pdf_utils import extract_pdf_tables, extract_pdf_text, page_chunks_to_passages
-from rag import Embedder, FaissIndex, answer_with_llm_or_extract, normalize_user_question
+from pdf_utils import PdfPageChunk, PdfTable, extract_pdf_text_and_tables, page_chunks_to_passages
+from rag import AnswerStream, Embedder, FaissIndex, choose_index_factory, gemini_client, normalize_user_question
 
 
 st.set_page_config(page_title="PDF RAG Chatbot + Finance Analyzer", layout="wide")
 
+_CACHE_DIR = os.getenv("RAG_CACHE_DIR", os.path.join(tempfile.gettempdir(), "rag_pdf_cache"))
+
+
+# Sidebar connectivity probes are memoized so widget reruns don't repeat the network round-trip.
+@st.cache_data(ttl=30, show_spinner=False)
+def _probe_ollama(url: str) -> Optional[Set[str]]:
+    """Returns the installed Ollama model names, or None if the server is unreachable."""
+    try:
+        tags = requests.get(f"{url}/api/tags", timeout=3).json()
+        return {m.get("name") for m in (tags.get("models") or [])}
+    except Exception:
+        return None
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _probe_gemini(api_key: str, model: str) -> Tuple[bool, Optional[str]]:
+    """Returns (responded, error_msg) for a tiny "Say OK" request."""
+    try:
+        _test = gemini_client(api_key).models.generate_content(
+            model=model,
+            contents="Say OK",
+            config={"max_output_tokens": 5},
+        )
+        return bool(_test.text), None
+    except Exception as e:
+        return False, str(e)
+
+
 st.title("PDF RAG Chatbot + Financial Analysis")
 
 with st.sidebar:
@@ -64,20 +95,13 @@ with st.sidebar:
         os.environ["GEMINI_TEMPERATURE"] = str(gemini_temp)
 
         if gemini_key:
-            try:
-                from google import genai
-                client = genai.Client(api_key=gemini_key)
-                _test = client.models.generate_content(
-                    model=gemini_model,
-                    contents="Say OK",
-                    config={"max_output_tokens": 5},
-                )
-                if _test.text:
-                    st.success(f"Gemini connected ({gemini_model})")
-                else:
-                    st.warning("Gemini returned empty response.")
-            except Exception as e:
-                st.warning(f"Gemini error: {e}")
+            gemini_ok, gemini_err = _probe_gemini(gemini_key, gemini_model)
+            if gemini_err:
+                st.warning(f"Gemini error: {gemini_err}")
+            elif gemini_ok:
+                st.success(f"Gemini connected ({gemini_model})")
+            else:
+                st.warning("Gemini returned empty response.")
         st.caption("Get a key at [Google AI Studio](https://aistudio.google.com/apikey)")
 
     elif llm_provider == "OpenAI":
@@ -112,34 +136,92 @@ with st.sidebar:
         os.environ["OLLAMA_TIMEOUT"] = str(int(ollama_timeout))
         os.environ["OLLAMA_MAX_TOKENS"] = str(int(ollama_max_tokens))
 
-        try:
-            tags = requests.get(f"{ollama_url}/api/tags", timeout=3).json()
-            model_names = {m.get("name") for m in (tags.get("models") or [])}
+        model_names = _probe_ollama(ollama_url)
+        if model_names is None:
+            st.warning("Ollama not reachable at this URL. Make sure Ollama is running.")
+        else:
             if model_names:
                 st.success("Ollama connected")
             if ollama_model and ollama_model not in model_names and f"{ollama_model}:latest" not in model_names:
                 st.warning(
                     f"Model '{ollama_model}' not found in Ollama. Run: `ollama pull {ollama_model}`",
                 )
-        except Exception:
-            st.warning("Ollama not reachable at this URL. Make sure Ollama is running.")
 
     st.caption("Tip: If provider is None, the app will show retrieved passages only.")
 
 
 @st.cache_resource
 def _embedder() -> Embedder:
-    return Embedder()
+    return Embedder(cache_path=os.path.join(_CACHE_DIR, "embeddings.sqlite"))
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_extract(pdf_bytes: bytes, max_pages: int) -> Tuple[List[PdfPageChunk], List[PdfTable]]:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as f:
+        f.write(pdf_bytes)
+        path = f.name
+    try:
+        return extract_pdf_text_and_tables(path, max_pages=max_pages)
+    finally:
+        os.unlink(path)
 
 
-def _build_index(passages: List[str]) -> FaissIndex:
+def _disk_cache_path(*parts: str) -> str:
+    """Path prefix in the on-disk cache used for warm restarts (RAG_CACHE_DIR)."""
+    os.makedirs(_CACHE_DIR, exist_ok=True)
+    key = hashlib.blake2b(":".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(_CACHE_DIR, key)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_parse_tables(tables_key: str, _tables: List[List[object]]) -> Optional[FinanceParseResult]:
+    # `_tables` is excluded from Streamlit's hashing; `tables_key` identifies it.
+    path = _disk_cache_path("finance", tables_key)
+    if os.path.exists(path + ".json"):
+        try:
+            return load_parse_result(path)
+        except Exception:
+            pass  # unreadable cache entry: reparse and overwrite
+    parsed = parse_financial_tables(_tables)
+    try:
+        save_parse_result(parsed, path)
+    except Exception:
+        pass  # disk cache is best-effort
+    return parsed
+
+
+def _build_index(passages: List[str], factory: str) -> FaissIndex:
     embedder = _embedder()
     vecs = embedder.embed(passages)
-    index = FaissIndex(dim=vecs.shape[1])
+    if factory == "auto":
+        factory = choose_index_factory(len(passages), vecs.shape[1])
+    index = FaissIndex(dim=vecs.shape[1], factory=factory)
     index.add(vecs, passages)
     return index
 
 
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _build_index_cached(
+    pdf_hash: str, max_pages: int, embedder_version: str, _passages: Tuple[str, ...]
+) -> FaissIndex:
+    # Shared across sessions; passages are fully determined by (pdf_hash, max_pages), so they are not hashed.
+    # embedder_version keys out indexes built with another model/precision, whose vectors queries no longer match.
+    # Backed by the disk cache so a server restart loads the index instead of re-embedding.
+    factory = os.getenv("FAISS_INDEX_FACTORY", "auto")
+    path = _disk_cache_path("index", pdf_hash, str(max_pages), embedder_version, factory)
+    if os.path.exists(path):
+        try:
+            return FaissIndex.load(path)
+        except Exception:
+            pass  # unreadable cache entry: rebuild and overwrite
+    index = _build_index(list(_passages), factory)
+    try:
+        index.save(path)
+    except Exception:
+        pass  # disk cache is best-effort
+    return index
+
+
 if "chat" not in st.session_state:
     st.session_state.chat = []  # list[dict]
 
@@ -155,9 +237,6 @@ if "finance" not in st.session_state:
 if "pdf_hash" not in st.session_state:
     st.session_state.pdf_hash = None
 
-if "pdf_path" not in st.session_state:
-    st.session_state.pdf_path = None
-
 
 col_left, col_right = st.columns([1.15, 0.85], gap="large")
 
@@ -167,7 +246,7 @@ with col_left:
         st.info("Upload a PDF to start.")
     else:
         file_bytes = uploaded.getvalue()
-        current_hash = hashlib.md5(file_bytes).hexdigest()
+        current_hash = hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
 
         needs_rebuild = (
             st.session_state.pdf_hash != current_hash
@@ -176,23 +255,22 @@ with col_left:
         )
 
         if needs_rebuild:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as f:
-                f.write(file_bytes)
-                st.session_state.pdf_path = f.name
-                st.session_state.pdf_hash = current_hash
+            st.session_state.pdf_hash = current_hash
 
-            with st.spinner("Extracting PDF text..."):
-                pages = extract_pdf_text(st.session_state.pdf_path, max_pages=int(max_pages))
+            with st.spinner("Extracting PDF text and tables..."):
+                pages, raw_tables = _cached_extract(file_bytes, int(max_pages))
                 passages = page_chunks_to_passages(pages)
                 st.session_state.passages = passages
 
             with st.spinner("Building vector index..."):
-                st.session_state.index = _build_index(passages)
+                st.session_state.index = _build_index_cached(
+                    current_hash, int(max_pages), _embedder().version, tuple(passages)
+                )
 
             with st.spinner("Scanning PDF tables for financial data..."):
-                raw_tables = extract_pdf_tables(st.session_state.pdf_path, max_pages=int(max_pages))
                 tables_only = [t for (_page, t) in raw_tables]
-                parsed = parse_financial_tables(tables_only)
+                tables_key = hashlib.blake2b(repr(tables_only).encode("utf-8"), digest_size=16).hexdigest()
+                parsed = _cached_parse_tables(tables_key, tables_only)
                 st.session_state.finance = parsed
 
             st.session_state.chat = []
@@ -213,19 +291,19 @@ with col_left:
             question_norm = normalize_user_question(question)
 
             embedder = _embedder()
-            qv = embedder.embed([question_norm or question])[0]
+            qv = embedder.embed_query(question_norm or question)
             retrieved = st.session_state.index.search(qv, top_k=top_k)
 
-            answer, used_llm = answer_with_llm_or_extract(question_norm or question, retrieved)
-
+            # Render retrieved passages first, then stream the answer into place as it arrives.
             with st.chat_message("assistant"):
-                st.markdown(answer)
                 with st.expander("Retrieved passages"):
                     for p in retrieved:
                         st.markdown(f"**score** {p.score:.3f}  ")
                         st.markdown(p.text)
                         st.divider()
-                st.caption("Answered with LLM" if used_llm else "No LLM configured (showing extractive context)")
+                stream = AnswerStream(question_norm or question, retrieved)
+                answer = st.write_stream(stream)
+                st.caption("Answered with LLM" if stream.used_llm else "No LLM configured (showing extractive context)")
 
             st.session_state.chat.append({"role": "assistant", "content": answer})
 
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
@@ -20,72 +23,75 @@ _AMOUNT_RE = re.compile(r"[-+]?\$?\s*\(?\s*\d{1,3}(?:,\d{3})*(?:\.\d+)?\s*\)?")
 _DATE_HINTS = ("date", "time", "datetime", "timestamp")
 _AMOUNT_HINTS = ("amount", "amt", "value", "total", "debit", "credit", "payment", "balance")
 _CATEGORY_HINTS = ("category", "type", "merchant", "description", "desc", "account")
+_DATETIME_SAMPLE_ROWS = 100
+_PARALLEL_TABLES_MIN = 4
+_MAX_TABLE_WORKERS = 8
+_PERIOD_FREQS = {"H": "h", "D": "D", "M": "M"}
 
 
 def _normalize_col(c: str) -> str:
     return re.sub(r"\s+", " ", str(c).strip().lower())
 
 
-def _to_number(x: object) -> Optional[float]:
-    if x is None:
-        return None
-    s = str(x).strip()
-    if not s:
-        return None
+def _to_number_series(s: pd.Series) -> pd.Series:
+    """Vectorized cell -> float conversion; unparseable cells become NaN."""
+    s = s.astype("string").str.strip()
     # detect parentheses as negative
-    neg = "(" in s and ")" in s
-    s = s.replace("$", "").replace(",", "")
-    s = re.sub(r"[^0-9.\-+]", "", s)
-    if not s:
-        return None
-    try:
-        v = float(s)
-        return -abs(v) if neg else v
-    except Exception:
-        return None
+    neg = (s.str.contains("(", regex=False) & s.str.contains(")", regex=False)).fillna(False)
+    s = s.str.replace(r"[^0-9.\-+]", "", regex=True)
+    v = pd.to_numeric(s, errors="coerce").astype(float)
+    return v.where(~neg, -v.abs())
 
 
-def _best_col(cols: List[str], hints: Tuple[str, ...]) -> Optional[str]:
-    norm = {c: _normalize_col(c) for c in cols}
+def _best_col(norm_map: Dict[str, str], hints: Tuple[str, ...]) -> Optional[str]:
+    """norm_map maps original column names to their _normalize_col() form."""
     for h in hints:
-        for c, nc in norm.items():
+        for c, nc in norm_map.items():
             if h in nc:
                 return c
     return None
 
 
-def _detect_amount_col(df: pd.DataFrame) -> Optional[str]:
-    cols = list(df.columns)
-    hinted = _best_col(cols, _AMOUNT_HINTS)
+def _detect_amount_col(str_cols: Dict[str, pd.Series], norm_map: Dict[str, str]) -> Optional[str]:
+    cols = list(norm_map)
+    hinted = _best_col(norm_map, _AMOUNT_HINTS)
     if hinted:
         return hinted
 
-    # Otherwise: choose col with most amount-like values
-    best = None
-    best_score = 0
+    # Otherwise: choose col with most amount-like values. Scoring with the same
+    # vectorized conversion used for parsing is cheap; the regex only breaks ties.
+    scores: Dict[str, float] = {}
     for c in cols:
-        series = df[c].dropna().astype(str)
+        series = str_cols[c]
         if series.empty:
             continue
-        hits = series.str.contains(_AMOUNT_RE).mean()
-        if hits > best_score:
-            best_score = float(hits)
-            best = c
-    return best if best_score >= 0.3 else None
+        scores[c] = float(_to_number_series(series).notna().mean())
+    candidates = [c for c, score in scores.items() if score >= 0.3]
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else None
+
+    top = max(scores[c] for c in candidates)
+    tied = [c for c in candidates if scores[c] == top]
+    if len(tied) == 1:
+        return tied[0]
+    return max(tied, key=lambda c: str_cols[c].str.contains(_AMOUNT_RE).mean())
 
 
-def _detect_datetime_col(df: pd.DataFrame) -> Optional[str]:
-    cols = list(df.columns)
-    hinted = _best_col(cols, _DATE_HINTS)
+def _detect_datetime_col(str_cols: Dict[str, pd.Series], norm_map: Dict[str, str]) -> Optional[str]:
+    cols = list(norm_map)
+    hinted = _best_col(norm_map, _DATE_HINTS)
     if hinted:
         return hinted
 
-    # Otherwise: try parse each column and take the best success rate
+    # Otherwise: try parse a sample of each column and take the best success rate
+    # (the winning column is parsed in full by the caller).
     best = None
     best_rate = 0.0
     for c in cols:
-        s = df[c]
-        parsed = pd.to_datetime(s, errors="coerce", utc=False)
+        sample = str_cols[c].head(_DATETIME_SAMPLE_ROWS)
+        if sample.empty:
+            continue
+        parsed = pd.to_datetime(sample, errors="coerce", utc=False)
         rate = float(parsed.notna().mean())
         if rate > best_rate:
             best_rate = rate
@@ -93,9 +99,13 @@ def _detect_datetime_col(df: pd.DataFrame) -> Optional[str]:
     return best if best_rate >= 0.3 else None
 
 
-def _detect_category_col(df: pd.DataFrame, *, exclude: List[str]) -> Optional[str]:
-    cols = [c for c in df.columns if c not in exclude]
-    hinted = _best_col(cols, _CATEGORY_HINTS)
+def _detect_category_col(
+    str_cols: Dict[str, pd.Series], norm_map: Dict[str, str], *, exclude: List[str], index: pd.Index
+) -> Optional[str]:
+    """index restricts scoring to the rows that survived datetime/amount parsing."""
+    norm_map = {c: nc for c, nc in norm_map.items() if c not in exclude}
+    cols = list(norm_map)
+    hinted = _best_col(norm_map, _CATEGORY_HINTS)
     if hinted:
         return hinted
 
@@ -103,7 +113,8 @@ def _detect_category_col(df: pd.DataFrame, *, exclude: List[str]) -> Optional[st
     best = None
     best_score = 0.0
     for c in cols:
-        s = df[c].dropna().astype(str)
+        s = str_cols[c]
+        s = s[s.index.isin(index)]
         if s.empty:
             continue
         unique = s.nunique()
@@ -117,49 +128,86 @@ def _detect_category_col(df: pd.DataFrame, *, exclude: List[str]) -> Optional[st
     return best
 
 
+def _evaluate_table(t: List[object]) -> Optional[FinanceParseResult]:
+    if not t or len(t) < 2:
+        return None
+
+    header = [str(x or "").strip() for x in t[0]]
+    if sum(1 for h in header if h) < 2:
+        return None
+
+    body = t[1:]
+    df = pd.DataFrame(body, columns=header)
+    df = df.dropna(how="all")
+    if len(df) < 3:
+        return None
+
+    norm_map = {c: _normalize_col(c) for c in df.columns}
+    # Non-null cells of each column as strings, shared by all detectors.
+    str_cols = {c: df[c].dropna().astype("string") for c in norm_map}
+    dt_col = _detect_datetime_col(str_cols, norm_map)
+    amt_col = _detect_amount_col(str_cols, norm_map)
+    if not dt_col or not amt_col:
+        return None
+
+    df2 = df.copy()
+    df2[dt_col] = pd.to_datetime(df2[dt_col], errors="coerce")
+    df2[amt_col] = _to_number_series(df2[amt_col])
+    df2 = df2.dropna(subset=[dt_col, amt_col])
+    if len(df2) < 3:
+        return None
+
+    cat_col = _detect_category_col(str_cols, norm_map, exclude=[dt_col, amt_col], index=df2.index)
+    return FinanceParseResult(df=df2, datetime_col=dt_col, amount_col=amt_col, category_col=cat_col)
+
+
 def parse_financial_tables(tables: List[List[object]]) -> Optional[FinanceParseResult]:
     """Heuristic parser: takes a list of table rows (each row a list of cells).
 
     Expects first row to be headers for at least one table.
     Returns the best candidate table as a DataFrame with detected datetime/amount/category columns.
     """
+    # Tables are independent; only fan out when there are enough to pay for the pool.
+    if len(tables) < _PARALLEL_TABLES_MIN:
+        results = [_evaluate_table(t) for t in tables]
+    else:
+        with ThreadPoolExecutor(max_workers=_MAX_TABLE_WORKERS) as pool:
+            results = list(pool.map(_evaluate_table, tables))
+
     best: Optional[FinanceParseResult] = None
     best_rows = 0
+    for candidate in results:
+        if candidate is not None and len(candidate.df) > best_rows:
+            best_rows = len(candidate.df)
+            best = candidate
+    return best
 
-    for t in tables:
-        if not t or len(t) < 2:
-            continue
-
-        header = [str(x or "").strip() for x in t[0]]
-        if sum(1 for h in header if h) < 2:
-            continue
-
-        body = t[1:]
-        df = pd.DataFrame(body, columns=header)
-        df = df.dropna(how="all")
-        if len(df) < 3:
-            continue
-
-        dt_col = _detect_datetime_col(df)
-        amt_col = _detect_amount_col(df)
-        if not dt_col or not amt_col:
-            continue
-
-        df2 = df.copy()
-        df2[dt_col] = pd.to_datetime(df2[dt_col], errors="coerce")
-        df2[amt_col] = df2[amt_col].map(_to_number)
-        df2 = df2.dropna(subset=[dt_col, amt_col])
-        if len(df2) < 3:
-            continue
-
-        cat_col = _detect_category_col(df2, exclude=[dt_col, amt_col])
 
-        candidate = FinanceParseResult(df=df2, datetime_col=dt_col, amount_col=amt_col, category_col=cat_col)
-        if len(df2) > best_rows:
-            best_rows = len(df2)
-            best = candidate
+def save_parse_result(parsed: Optional[FinanceParseResult], path: str) -> None:
+    """Persist a parse result as `path + ".parquet"` (table) and `path + ".json"` (detected columns).
 
-    return best
+    A None result is stored as metadata only, so "no financial table" is cached too.
+    """
+    meta = None
+    if parsed is not None:
+        parsed.df.to_parquet(path + ".parquet")
+        meta = {
+            "datetime_col": parsed.datetime_col,
+            "amount_col": parsed.amount_col,
+            "category_col": parsed.category_col,
+        }
+    with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(path + ".json.tmp", path + ".json")
+
+
+def load_parse_result(path: str) -> Optional[FinanceParseResult]:
+    """Inverse of save_parse_result()."""
+    with open(path + ".json", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta is None:
+        return None
+    return FinanceParseResult(df=pd.read_parquet(path + ".parquet"), **meta)
 
 
 def aggregate_finance(
@@ -168,76 +216,125 @@ def aggregate_finance(
     freq: str,
 ) -> pd.DataFrame:
     """Aggregate by time freq. freq in {'H','D','M'}"""
-    df = parsed.df.copy()
     dt = parsed.datetime_col
     amt = parsed.amount_col
 
-    df = df.sort_values(dt)
-    df = df.set_index(dt)
-    agg = df[amt].resample(freq).sum().to_frame(name="total_amount")
+    # Group on period codes rather than resampling: empty bins are skipped and no full DatetimeIndex is built.
+    periods = pd.to_datetime(parsed.df[dt]).dt.to_period(_PERIOD_FREQS.get(freq, freq))
+    total = parsed.df[amt].groupby(periods).sum()
+    agg = total.to_frame(name="total_amount")
     agg["abs_total"] = agg["total_amount"].abs()
-    return agg.reset_index().rename(columns={dt: "period"})
+    agg = agg.reset_index(names="period")
+    agg["period"] = agg["period"].dt.to_timestamp()
+    return agg
+
+
+@dataclass
+class _AmountStats:
+    values: np.ndarray
+    pos_mask: np.ndarray
+    neg_mask: np.ndarray
+    net_sum: float
+    pos_sum: float
+    neg_sum: float
+
+
+def _amount_stats(parsed: FinanceParseResult) -> _AmountStats:
+    """Sign masks and signed sums of the amount column, computed once per call site."""
+    arr = parsed.df[parsed.amount_col].to_numpy(dtype=np.float64, copy=False)
+    pos_mask = arr > 0
+    neg_mask = arr < 0
+    return _AmountStats(
+        values=arr,
+        pos_mask=pos_mask,
+        neg_mask=neg_mask,
+        net_sum=float(arr.sum()),
+        pos_sum=float(arr[pos_mask].sum()),
+        neg_sum=float(arr[neg_mask].sum()),
+    )
 
 
 def totals(parsed: FinanceParseResult) -> dict:
-    amt = parsed.amount_col
-    s = parsed.df[amt].astype(float)
+    stats = _amount_stats(parsed)
+    n = stats.values.size
     return {
         "rows": int(len(parsed.df)),
-        "sum": float(s.sum()),
-        "income_sum_pos": float(s[s > 0].sum()),
-        "expense_sum_neg": float(s[s < 0].sum()),
-        "mean": float(s.mean()),
+        "sum": stats.net_sum,
+        "income_sum_pos": stats.pos_sum,
+        "expense_sum_neg": stats.neg_sum,
+        "mean": stats.net_sum / n if n else float("nan"),
     }
 
 
+def _top_abs_totals(labels: pd.Series, amounts: pd.Series, *, top_n: int) -> pd.DataFrame:
+    """Largest |sum(amount)| per label as a label/value frame, sorted descending. NaN labels are dropped."""
+    codes, uniques = pd.factorize(labels, use_na_sentinel=True)
+    valid = codes >= 0
+    sums = np.bincount(
+        codes[valid],
+        weights=amounts.to_numpy(dtype=np.float64)[valid],
+        minlength=len(uniques),
+    )
+    abs_sums = np.abs(sums)
+
+    # argpartition picks the top N groups without sorting all of them
+    if top_n < len(abs_sums):
+        idx = np.argpartition(-abs_sums, top_n)[:top_n]
+    else:
+        idx = np.arange(len(abs_sums))
+    idx = idx[np.argsort(-abs_sums[idx], kind="stable")]
+    return pd.DataFrame({"label": np.asarray(uniques)[idx], "value": abs_sums[idx]})
+
+
 def pie_breakdown(parsed: FinanceParseResult, *, top_n: int = 8) -> Tuple[pd.DataFrame, str]:
     """Return (df, label) where df has columns label/value for a pie chart."""
     amt = parsed.amount_col
-    df = parsed.df.copy()
 
     if parsed.category_col:
-        cat = parsed.category_col
-        grp = df.groupby(cat, dropna=True)[amt].sum().abs().sort_values(ascending=False)
-        grp = grp.head(top_n)
-        out = grp.reset_index().rename(columns={cat: "label", amt: "value"})
+        out = _top_abs_totals(parsed.df[parsed.category_col], parsed.df[amt], top_n=top_n)
         return out, "By category (absolute amount)"
 
     # fallback: by month
     dt = parsed.datetime_col
-    df["month"] = pd.to_datetime(df[dt]).dt.to_period("M").astype(str)
-    grp = df.groupby("month")[amt].sum().abs().sort_values(ascending=False)
-    grp = grp.head(top_n)
-    out = grp.reset_index().rename(columns={"month": "label", amt: "value"})
+    month = pd.to_datetime(parsed.df[dt]).dt.to_period("M").astype(str)
+    out = _top_abs_totals(month, parsed.df[amt], top_n=top_n)
     return out, "By month (absolute amount)"
 
 
 def advanced_summary(parsed: FinanceParseResult) -> Dict[str, float]:
     """More detailed numeric summary for the detected financial table."""
-    amt = parsed.amount_col
-    s = parsed.df[amt].astype(float)
+    stats = _amount_stats(parsed)
+    arr = stats.values
+    n = arr.size
+
+    # Order statistics and spread are the only reductions left; everything
+    # else derives from the signed sums and sign masks in `stats`.
+    if n:
+        spread = {
+            "median": float(np.median(arr)),
+            "std": float(arr.std(ddof=1)) if n > 1 else 0.0,
+            "min": float(arr.min()),
+            "max": float(arr.max()),
+        }
+    else:
+        spread = {"median": 0.0, "std": 0.0, "min": 0.0, "max": 0.0}
 
-    pos = s[s > 0]
-    neg = s[s < 0]
     return {
-        "rows": float(len(s)),
-        "net_sum": float(s.sum()),
-        "abs_sum": float(s.abs().sum()),
-        "income_sum_pos": float(pos.sum()) if len(pos) else 0.0,
-        "expense_sum_neg": float(neg.sum()) if len(neg) else 0.0,
-        "mean": float(s.mean()) if len(s) else 0.0,
-        "median": float(s.median()) if len(s) else 0.0,
-        "std": float(s.std(ddof=1)) if len(s) > 1 else 0.0,
-        "min": float(s.min()) if len(s) else 0.0,
-        "max": float(s.max()) if len(s) else 0.0,
-        "income_count": float(len(pos)),
-        "expense_count": float(len(neg)),
+        "rows": float(n),
+        "net_sum": stats.net_sum,
+        "abs_sum": stats.pos_sum - stats.neg_sum,
+        "income_sum_pos": stats.pos_sum,
+        "expense_sum_neg": stats.neg_sum,
+        "mean": stats.net_sum / n if n else 0.0,
+        **spread,
+        "income_count": float(np.count_nonzero(stats.pos_mask)),
+        "expense_count": float(np.count_nonzero(stats.neg_mask)),
     }
 
 
 def top_transactions(parsed: FinanceParseResult, *, n: int = 8) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Return (top_income, top_expense) by absolute amount."""
-    df = parsed.df.copy()
+    df = parsed.df
     dt = parsed.datetime_col
     amt = parsed.amount_col
 
@@ -245,9 +342,10 @@ def top_transactions(parsed: FinanceParseResult, *, n: int = 8) -> Tuple[pd.Data
     if parsed.category_col and parsed.category_col in df.columns:
         cols.append(parsed.category_col)
 
-    base = df[cols].copy().sort_values(dt)
-    income = base[base[amt] > 0].sort_values(amt, ascending=False).head(n)
-    expense = base[base[amt] < 0].sort_values(amt, ascending=True).head(n)
+    stats = _amount_stats(parsed)
+    base = df[cols]
+    income = base[stats.pos_mask].sort_values(dt).sort_values(amt, ascending=False, kind="stable").head(n)
+    expense = base[stats.neg_mask].sort_values(dt).sort_values(amt, ascending=True, kind="stable").head(n)
     return income.reset_index(drop=True), expense.reset_index(drop=True)
 
 
@@ -258,11 +356,24 @@ def category_breakdown(parsed: FinanceParseResult, *, top_n: int = 12) -> Tuple[
     cat = parsed.category_col
     amt = parsed.amount_col
 
-    grp = parsed.df.groupby(cat, dropna=True)[amt].sum().abs().sort_values(ascending=False).head(top_n)
-    out = grp.reset_index().rename(columns={cat: "label", amt: "value"})
+    out = _top_abs_totals(parsed.df[cat], parsed.df[amt], top_n=top_n)
     return out, "Top categories (absolute amount)"
 
 
+def _keyword_re(*keywords: str) -> re.Pattern[str]:
+    """One alternation matching any keyword as a substring (same semantics as `k in text`)."""
+    return re.compile("|".join(re.escape(k) for k in keywords))
+
+
+_CHART_BAR_RE = _keyword_re("bar chart", "barchart", "bar")
+_CHART_PIE_RE = _keyword_re("pie chart", "pie")
+_CHART_LINE_RE = _keyword_re("line chart", "trend", "over time", "time series", "timeline", "line")
+_GROUP_CATEGORY_RE = _keyword_re("category", "merchant", "type", "by category")
+_GROUP_HOUR_RE = _keyword_re("hour", "hourly")
+_GROUP_DAY_RE = _keyword_re("day", "daily")
+_GROUP_MONTH_RE = _keyword_re("month", "monthly")
+
+
 def parse_finance_request(user_text: str) -> Dict[str, str]:
     """Tiny rule-based intent parser for finance UI.
 
@@ -270,21 +381,21 @@ def parse_finance_request(user_text: str) -> Dict[str, str]:
     """
     t = " ".join((user_text or "").strip().lower().split())
     chart = "none"
-    if any(k in t for k in ("bar chart", "barchart", "bar")):
+    if _CHART_BAR_RE.search(t):
         chart = "bar"
-    elif any(k in t for k in ("pie chart", "pie")):
+    elif _CHART_PIE_RE.search(t):
         chart = "pie"
-    elif any(k in t for k in ("line chart", "trend", "over time", "time series", "timeline", "line")):
+    elif _CHART_LINE_RE.search(t):
         chart = "line"
 
     group = "auto"
-    if any(k in t for k in ("category", "merchant", "type", "by category")):
+    if _GROUP_CATEGORY_RE.search(t):
         group = "category"
-    elif any(k in t for k in ("hour", "hourly")):
+    elif _GROUP_HOUR_RE.search(t):
         group = "hour"
-    elif any(k in t for k in ("day", "daily")):
+    elif _GROUP_DAY_RE.search(t):
         group = "day"
-    elif any(k in t for k in ("month", "monthly")):
+    elif _GROUP_MONTH_RE.search(t):
         group = "month"
 
     return {"chart": chart, "group": group}
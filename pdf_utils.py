@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Iterable, List, Optional, Tuple
+from itertools import repeat
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 import pdfplumber
 
+_MAX_PAGE_WORKERS = 8
+_PAGES_PER_WORKER = 8  # below this, starting a process and re-opening the PDF costs more than it saves
+_WS_RE = re.compile(r"\s+")
+_BOUNDARY_SLACK = 32
+
 
 @dataclass(frozen=True)
 class PdfPageChunk:
@@ -12,55 +21,108 @@ class PdfPageChunk:
     text: str
 
 
-def extract_pdf_text(path: str, *, max_pages: Optional[int] = None) -> List[PdfPageChunk]:
+PdfTable = Tuple[int, List[List[Optional[str]]]]
+
+
+def _page_limit(pdf: pdfplumber.PDF, max_pages: Optional[int]) -> int:
+    page_count = len(pdf.pages)
+    return min(page_count, max_pages) if max_pages else page_count
+
+
+def _extract_page(page: pdfplumber.page.Page, *, text: bool, tables: bool) -> Tuple[str, list]:
+    page_text = (page.extract_text() or "").strip() if text else ""
+    page_tables = (page.extract_tables() or []) if tables else []
+    return page_text, page_tables
+
+
+def _extract_page_range(path: str, start: int, stop: int, text: bool, tables: bool) -> List[Tuple[str, list]]:
+    # Runs in a worker process with its own open PDF: pdfminer parses all pages through one shared file
+    # pointer, so a document cannot be read from several threads, and pure-Python parsing holds the GIL anyway.
+    with pdfplumber.open(path) as pdf:
+        return [_extract_page(pdf.pages[i], text=text, tables=tables) for i in range(start, stop)]
+
+
+def _extract_pages(
+    path: str, *, max_pages: Optional[int], text: bool, tables: bool
+) -> Tuple[List[PdfPageChunk], List[PdfTable]]:
     chunks: List[PdfPageChunk] = []
+    out: List[PdfTable] = []
     with pdfplumber.open(path) as pdf:
-        page_count = len(pdf.pages)
-        limit = min(page_count, max_pages) if max_pages else page_count
-        for i in range(limit):
-            page = pdf.pages[i]
-            text = page.extract_text() or ""
-            text = text.strip()
-            if text:
-                chunks.append(PdfPageChunk(page=i + 1, text=text))
-    return chunks
-
-
-def extract_pdf_tables(path: str, *, max_pages: Optional[int] = None) -> List[Tuple[int, List[List[Optional[str]]]]]:
+        limit = _page_limit(pdf, max_pages)
+        workers = min(_MAX_PAGE_WORKERS, os.cpu_count() or 1, limit // _PAGES_PER_WORKER)
+        if workers <= 1:
+            per_page = [_extract_page(pdf.pages[i], text=text, tables=tables) for i in range(limit)]
+    if workers > 1:
+        # One contiguous page range per process, concatenated back in page order.
+        bounds = [limit * k // workers for k in range(workers + 1)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            ranges = pool.map(_extract_page_range, repeat(path), bounds[:-1], bounds[1:], repeat(text), repeat(tables))
+            per_page = [page for pages in ranges for page in pages]
+    for i, (page_text, page_tables) in enumerate(per_page):
+        if page_text:
+            chunks.append(PdfPageChunk(page=i + 1, text=page_text))
+        # Flatten: for each table we keep its rows
+        for t in page_tables:
+            out.append((i + 1, t))
+    return chunks, out
+
+
+def extract_pdf_text_and_tables(
+    path: str, *, max_pages: Optional[int] = None
+) -> Tuple[List[PdfPageChunk], List[PdfTable]]:
+    """Open the PDF once and return (page text chunks, (page_number, table rows) pairs)."""
+    return _extract_pages(path, max_pages=max_pages, text=True, tables=True)
+
+
+def extract_pdf_text(path: str, *, max_pages: Optional[int] = None) -> List[PdfPageChunk]:
+    return _extract_pages(path, max_pages=max_pages, text=True, tables=False)[0]
+
+
+def extract_pdf_tables(path: str, *, max_pages: Optional[int] = None) -> List[PdfTable]:
     """Returns list of (page_number, tables) where tables is a list of rows."""
-    out: List[Tuple[int, List[List[Optional[str]]]]] = []
-    with pdfplumber.open(path) as pdf:
-        page_count = len(pdf.pages)
-        limit = min(page_count, max_pages) if max_pages else page_count
-        for i in range(limit):
-            page = pdf.pages[i]
-            tables = page.extract_tables() or []
-            if tables:
-                # Flatten: for each table we keep its rows
-                for t in tables:
-                    out.append((i + 1, t))
-    return out
-
-
-def chunk_text(text: str, *, chunk_size: int = 1200, overlap: int = 150) -> List[str]:
+    return _extract_pages(path, max_pages=max_pages, text=False, tables=True)[1]
+
+
+def _snap_to_space(text: str, pos: int, lo: int, hi: int) -> int:
+    """Move pos to the nearest space in [lo, hi), or leave it if there is none."""
+    left = text.rfind(" ", lo, pos + 1)
+    right = text.find(" ", pos, hi)
+    if left == -1 and right == -1:
+        return pos
+    if right == -1 or (left != -1 and pos - left <= right - pos):
+        return left
+    return right
+
+
+def chunk_text(text: str, *, chunk_size: int = 1200, overlap: int = 150) -> Iterator[str]:
+    """Lazily split text into ~chunk_size windows overlapping by ~overlap chars.
+
+    Whitespace is collapsed first and window edges snap to the nearest space within
+    _BOUNDARY_SLACK chars, so words are not cut in half.
+    """
     if chunk_size <= 0:
         raise ValueError("chunk_size must be > 0")
     if overlap < 0:
         raise ValueError("overlap must be >= 0")
+    return _iter_chunks(_WS_RE.sub(" ", text).strip(), chunk_size, overlap)
 
-    text = " ".join(text.split())
-    if not text:
-        return []
 
-    chunks: List[str] = []
+def _iter_chunks(text: str, chunk_size: int, overlap: int) -> Iterator[str]:
+    n = len(text)
     start = 0
-    while start < len(text):
-        end = min(len(text), start + chunk_size)
-        chunks.append(text[start:end])
-        if end == len(text):
+    while start < n:
+        end = min(n, start + chunk_size)
+        if end < n:
+            end = _snap_to_space(text, end, max(start + 1, end - _BOUNDARY_SLACK), min(n, end + _BOUNDARY_SLACK))
+        yield text[start:end]
+        if end == n:
             break
-        start = max(0, end - overlap)
-    return chunks
+        next_start = max(start + 1, end - overlap)
+        if next_start > 0 and text[next_start - 1] != " ":
+            space = text.find(" ", next_start, min(end, next_start + _BOUNDARY_SLACK))
+            if space != -1:
+                next_start = space + 1
+        start = next_start
 
 
 def page_chunks_to_passages(pages: Iterable[PdfPageChunk]) -> List[str]:
@@ -1,59 +1,338 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import math
 import os
 import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import numpy as np
+import pyarrow as pa
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+if TYPE_CHECKING:
+    import httpx
+    from google import genai
+    from openai import AsyncOpenAI, OpenAI
+    from sentence_transformers import SentenceTransformer
+
+_IVF_MIN_VECTORS = 10_000
+_ADD_FLUSH_VECTORS = 10_000
 
 
 @dataclass
 class RetrievedPassage:
     text: str
     score: float
+    # _concept_mask(text), filled in by FaissIndex from masks computed at add() time; None = compute on demand.
+    concepts: Optional[int] = None
+
+
+class _EmbeddingCache:
+    """SQLite-backed content-addressed store: blake2b(model name + precision, text) -> float32 vector.
+
+    One connection is shared between Streamlit's script threads, guarded by a lock.
+    """
+
+    _QUERY_CHUNK = 500  # stay under SQLite's bound-parameter limit
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for i in range(0, len(keys), self._QUERY_CHUNK):
+                chunk = keys[i : i + self._QUERY_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: List[Tuple[bytes, np.ndarray]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)",
+                [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in items],
+            )
+
+
+@lru_cache(maxsize=4)
+def _get_st_model(model_name: str, device: Optional[str], fp16: bool) -> "SentenceTransformer":
+    """One loaded SentenceTransformer per (model, device, precision), shared by every Embedder in the process."""
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device=device)
+    # Half precision halves weight/activation bandwidth on GPU; unit-normalized outputs keep IP scores comparable.
+    if fp16 and model.device.type == "cuda":
+        model.half()
+    return model
 
 
 class Embedder:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2") -> None:
-        from sentence_transformers import SentenceTransformer
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        *,
+        cache_path: Optional[str] = None,
+        device: Optional[str] = None,
+        batch_size: Optional[int] = None,
+    ) -> None:
+        """cache_path (or EMBED_CACHE_PATH) enables a persistent SQLite embedding cache; texts seen before skip the model.
+
+        device (or EMBED_DEVICE, e.g. "cuda") is passed to SentenceTransformer; None lets it auto-detect. On CUDA the
+        model runs in FP16 unless EMBED_FP16=0.
+        batch_size (or EMBED_BATCH, default 64) is the encode mini-batch size.
+        """
+        fp16 = os.getenv("EMBED_FP16", "1") != "0"
+        self._model = _get_st_model(model_name, device or os.getenv("EMBED_DEVICE") or None, fp16)
+        precision = "fp16" if fp16 and self._model.device.type == "cuda" else "fp32"
+        self._cache_namespace = f"{model_name}|{precision}"
+        self._batch_size = batch_size or int(os.getenv("EMBED_BATCH", "64"))
+        cache_path = cache_path or os.getenv("EMBED_CACHE_PATH")
+        self._cache = _EmbeddingCache(cache_path) if cache_path else None
+        self._embed_query_cached = lru_cache(maxsize=1024)(self._embed_query)
 
-        self._model = SentenceTransformer(model_name)
+    @property
+    def version(self) -> str:
+        """Model name and precision; vectors are only comparable between embedders with the same version."""
+        return self._cache_namespace
 
     def embed(self, texts: List[str]) -> np.ndarray:
-        vecs = self._model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
-        return np.asarray(vecs, dtype=np.float32)
+        """Embed all texts in one call (encoded in length-sorted mini-batches of batch_size).
+
+        Returns a C-contiguous float32 (n, dim) array of unit vectors, which FAISS can add/search without copying.
+        With a cache configured, only texts missing from it are encoded; the rest are read back.
+        """
+        if self._cache is None or not texts:
+            return self._encode(texts)
+
+        keys = [self._cache_key(t) for t in texts]
+        found = self._cache.get_many(keys)
+        missing = [i for i, k in enumerate(keys) if k not in found]
+        if not missing:
+            return np.ascontiguousarray(np.stack([found[k] for k in keys]), dtype=np.float32)
+
+        fresh = self._encode([texts[i] for i in missing])
+        self._cache.put_many([(keys[i], vec) for i, vec in zip(missing, fresh)])
+
+        out = np.empty((len(texts), fresh.shape[1]), dtype=np.float32)
+        out[missing] = fresh
+        for i, k in enumerate(keys):
+            if k in found:
+                out[i] = found[k]
+        return out
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        # SentenceTransformer.encode already sorts inputs by length before batching (and restores the order),
+        # so each mini-batch pads to similar lengths; only the batch size needs tuning here.
+        vecs = self._model.encode(
+            texts,
+            batch_size=self._batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.ascontiguousarray(vecs, dtype=np.float32)
+
+    def _cache_key(self, text: str) -> bytes:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self._cache_namespace.encode("utf-8"))
+        h.update(b"\0")
+        h.update(text.encode("utf-8"))
+        return h.digest()
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embed a single query as a (dim,) vector; repeated queries are served from an LRU cache."""
+        return self._embed_query_cached(text)
+
+    def _embed_query(self, text: str) -> np.ndarray:
+        vec = self.embed([text])[0]
+        vec.setflags(write=False)  # shared between cache hits
+        return vec
+
+
+def choose_index_factory(n_vectors: int, dim: int, *, small: str = "SQ8") -> str:
+    """Pick an index_factory string for a corpus of n_vectors.
+
+    Up to _IVF_MIN_VECTORS the brute-force `small` index is fast enough. Above that an IVF index with 8-bit
+    scalar-quantized lists (IndexIVFScalarQuantizer) makes search sublinear (only nprobe of nlist inverted lists
+    are scanned) and streams 1 byte per dimension instead of 4. For even smaller codes pass e.g. "IVF1024,PQ32"
+    via FAISS_INDEX_FACTORY.
+    """
+    if n_vectors <= _IVF_MIN_VECTORS:
+        return small
+    # ~4*sqrt(N) lists, capped so k-means gets the ~39 training points per centroid FAISS asks for.
+    nlist = max(1, min(4096, int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+    return f"IVF{nlist},SQ8"
 
 
 class FaissIndex:
-    def __init__(self, dim: int) -> None:
+    def __init__(self, dim: int, *, factory: str = "Flat") -> None:
+        """factory is a faiss.index_factory description, e.g. "Flat" (exact fp32), "SQ8" (int8 codes, 4x smaller)
+        or "IVF1024,SQ8" (see choose_index_factory).
+
+        Indexes that need training are trained on the first batch passed to add(), so for IVF that batch must
+        hold at least nlist vectors.
+        """
+        import faiss
+
+        self._init_state(faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT), [])
+
+    def _init_state(self, index: object, passages: List[str]) -> None:
         import faiss
 
         self._faiss = faiss
-        self._index = faiss.IndexFlatIP(dim)
-        self._passages: List[str] = []
+        self._index = index
+        # Passage texts as one Arrow string array (a byte buffer + offsets) indexed by FAISS id, rather than a
+        # list of Python str objects.
+        self._passages = pa.array(passages, type=pa.large_string())
+        self._concept_masks = _concept_masks(passages)
+
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            # Inverted lists scanned per query: higher = better recall, slower search.
+            ivf.nprobe = int(os.getenv("FAISS_NPROBE", "16"))
+
+        # OpenMP thread count for search; None keeps FAISS's default of one thread per core. Applied per call in
+        # search_batch because omp_set_num_threads only affects the calling thread, and Streamlit searches from a
+        # different script thread than the one that built the index.
+        num_threads = os.getenv("FAISS_NUM_THREADS")
+        self._num_threads = int(num_threads) if num_threads else None
+
+    def save(self, path: str) -> None:
+        """Write the FAISS index to `path` and its passages to `path + ".json"`.
+
+        Files are written via a temp name and renamed, index last, so a present index file implies a complete pair.
+        """
+        with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+            json.dump(self._passages.to_pylist(), f)
+        os.replace(path + ".json.tmp", path + ".json")
+        self._faiss.write_index(self._index, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "FaissIndex":
+        """Inverse of save()."""
+        import faiss
+
+        with open(path + ".json", encoding="utf-8") as f:
+            passages = json.load(f)
+        self = cls.__new__(cls)
+        self._init_state(faiss.read_index(path), passages)
+        return self
 
     @property
     def size(self) -> int:
         return len(self._passages)
 
+    def train(self, vectors: np.ndarray) -> None:
+        """Fit coarse centroids / quantizer ranges. add() calls this on its first batch if needed."""
+        self._index.train(vectors)
+
     def add(self, vectors: np.ndarray, passages: List[str]) -> None:
         if len(passages) != vectors.shape[0]:
             raise ValueError("passages and vectors must have same length")
+        if not passages:
+            return  # nothing to add, and FAISS cannot train a quantizer on zero vectors
+        if not self._index.is_trained:
+            self.train(vectors)
         self._index.add(vectors)
-        self._passages.extend(passages)
+        self._passages = pa.concat_arrays([self._passages, pa.array(passages, type=pa.large_string())])
+        self._concept_masks = np.concatenate([self._concept_masks, _concept_masks(passages)])
+
+    def add_many(self, batches: Iterable[Tuple[np.ndarray, List[str]]]) -> None:
+        """add() for many (vectors, passages) batches, e.g. one per document.
+
+        Batches are buffered and copied into one preallocated float32 block, so FAISS sees a single add() per
+        _ADD_FLUSH_VECTORS vectors instead of one per batch (and an untrained index trains on that larger block).
+        """
+        pending: List[Tuple[np.ndarray, List[str]]] = []
+        n_pending = 0
+        for vectors, passages in batches:
+            if len(passages) != vectors.shape[0]:
+                raise ValueError("passages and vectors must have same length")
+            pending.append((vectors, passages))
+            n_pending += len(passages)
+            if n_pending >= _ADD_FLUSH_VECTORS:
+                self._flush(pending, n_pending)
+                pending, n_pending = [], 0
+        self._flush(pending, n_pending)
+
+    def _flush(self, pending: List[Tuple[np.ndarray, List[str]]], n_vectors: int) -> None:
+        if not pending:
+            return
+        buf = np.empty((n_vectors, self._index.d), dtype=np.float32)
+        np.concatenate([v for v, _ in pending], axis=0, out=buf, casting="same_kind")
+        self.add(buf, [p for _, batch in pending for p in batch])
 
-    def search(self, query_vector: np.ndarray, top_k: int = 6) -> List[RetrievedPassage]:
+    def search(
+        self, query_vector: np.ndarray, top_k: int = 6, *, nthreads: Optional[int] = None
+    ) -> List[RetrievedPassage]:
         if query_vector.ndim == 1:
             query_vector = query_vector.reshape(1, -1)
-        scores, idxs = self._index.search(query_vector.astype(np.float32), top_k)
-        results: List[RetrievedPassage] = []
-        for score, idx in zip(scores[0].tolist(), idxs[0].tolist()):
-            if idx < 0 or idx >= len(self._passages):
-                continue
-            results.append(RetrievedPassage(text=self._passages[idx], score=float(score)))
-        return results
+        return self.search_batch(query_vector[:1], top_k, nthreads=nthreads)[0]
+
+    def search_batch(
+        self, query_vectors: np.ndarray, top_k: int = 6, *, nthreads: Optional[int] = None
+    ) -> List[List[RetrievedPassage]]:
+        """Search many (n, dim) queries in one FAISS call; returns one result list per query row.
+
+        FAISS parallelizes over queries and streams the index once per call, so batching concurrent
+        questions is much cheaper than calling search() per question.
+
+        nthreads (default: FAISS_NUM_THREADS) sets the OpenMP thread count for this call; the calling thread's
+        previous setting is restored afterwards and other threads are unaffected. A single query on a flat index is
+        memory-bound, so 2-4 threads often beat all cores; large batches want more.
+        """
+        if self._index.ntotal == 0:
+            # An empty non-Flat index was never trained, and FAISS refuses to search it.
+            return [[] for _ in range(len(query_vectors))]
+        # no-op when already C-contiguous float32 (what Embedder returns); astype() would always copy
+        q = np.ascontiguousarray(query_vectors, dtype=np.float32)
+        if nthreads is None:
+            nthreads = self._num_threads
+        if nthreads is None:
+            scores, idxs = self._index.search(q, top_k)
+        else:
+            prev_threads = self._faiss.omp_get_max_threads()
+            self._faiss.omp_set_num_threads(nthreads)
+            try:
+                scores, idxs = self._index.search(q, top_k)
+            finally:
+                self._faiss.omp_set_num_threads(prev_threads)
+        # FAISS pads missing hits with -1; mask them (and any stale ids) in one vectorized pass.
+        valid = (idxs >= 0) & (idxs < len(self._passages))
+        # One gather for all rows, then split back per query.
+        hit_ids = idxs[valid]
+        texts = self._passages.take(pa.array(hit_ids)).to_pylist()
+        hit_scores = scores[valid].tolist()
+        masks = self._concept_masks[hit_ids].tolist()
+        out: List[List[RetrievedPassage]] = []
+        start = 0
+        for n in valid.sum(axis=1).tolist():
+            stop = start + n
+            row = zip(texts[start:stop], hit_scores[start:stop], masks[start:stop])
+            out.append([RetrievedPassage(text=t, score=sc, concepts=m) for t, sc, m in row])
+            start += n
+        return out
 
 
 _COMMON_CORRECTIONS = {
@@ -67,32 +346,41 @@ _COMMON_CORRECTIONS = {
 }
 
 
+_CORRECTIONS_RE = re.compile(
+    r"\b(" + "|".join(re.escape(w) for w in _COMMON_CORRECTIONS) + r")\b",
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=4096)
 def normalize_user_question(question: str) -> str:
     q = " ".join((question or "").strip().split())
     if not q:
         return ""
 
+    # Fast path: the regex can only match where a misspelling occurs as a substring, which most questions lack.
+    ql = q.lower()
+    if not any(w in ql for w in _COMMON_CORRECTIONS):
+        return q
+
     # conservative word-level corrections (keeps user meaning; helps retrieval)
-    tokens = q.split(" ")
-    tokens = [_COMMON_CORRECTIONS.get(t.lower(), t) for t in tokens]
-    return " ".join(tokens)
+    return _CORRECTIONS_RE.sub(lambda m: _COMMON_CORRECTIONS[m.group(1).lower()], q)
 
 
-def _wants_summary(q: str) -> bool:
-    ql = q.lower()
+# The intent heuristics take the question already lowercased (ql), so it is lowered once per question.
+def _wants_summary_ql(ql: str) -> bool:
     return any(k in ql for k in ("summarize", "summary", "summarise"))
 
 
-def _summary_is_underspecified(q: str) -> bool:
+def _summary_is_underspecified_ql(ql: str) -> bool:
     # If they say “summarize” but don't mention scope, ask a quick clarifying question.
-    ql = q.lower()
-    if not _wants_summary(ql):
+    if not _wants_summary_ql(ql):
         return False
     scope_markers = ("page", "pages", "section", "chapter", "table", "about", "focus on", "only")
     return not any(m in ql for m in scope_markers)
 
 
-_MONEY_RE = re.compile(r"(?:[$€£]\s*\d|\b\d{1,3}(?:,\d{3})+(?:\.\d+)?\b)")
+_MONEY_RE = re.compile(r"(?:[$€£]\s*\d|\b\d{1,3}(?:,\d{3})+(?:\.\d+)?\b)", re.ASCII)
 _FINANCE_TERMS = (
     "revenue",
     "income",
@@ -126,8 +414,7 @@ _FINANCE_TERMS = (
 )
 
 
-def _looks_like_financial_concepts_question(q: str) -> bool:
-    ql = q.lower()
+def _looks_like_financial_concepts_ql(ql: str) -> bool:
     return (
         "financial concept" in ql
         or "financial concepts" in ql
@@ -135,30 +422,84 @@ def _looks_like_financial_concepts_question(q: str) -> bool:
     )
 
 
-def _extract_financial_concepts_from_context(context_passages: List[str]) -> List[str]:
-    joined = "\n".join(context_passages)
-    jl = joined.lower()
+# All finance terms in one linear scan. The zero-width lookahead tries a match at every position, so overlapping
+# terms ("subtotal" / "total") are all seen; longest-first alternation plus _TERM_PREFIXES covers terms that start
+# at the same position ("expenses" / "expense").
+_FINANCE_TERMS_RE = re.compile(
+    "(?=(" + "|".join(re.escape(t) for t in sorted(_FINANCE_TERMS, key=len, reverse=True)) + "))"
+)
+_TERM_PREFIXES = {u: tuple(t for t in _FINANCE_TERMS if u.startswith(t)) for u in _FINANCE_TERMS}
+
 
-    found: List[str] = []
-    for term in _FINANCE_TERMS:
-        if term in jl:
-            found.append(term)
+def _finance_terms_in(text_lower: str) -> Set[str]:
+    """Finance terms occurring as substrings of already-lowercased text."""
+    present: Set[str] = set()
+    for m in _FINANCE_TERMS_RE.finditer(text_lower):
+        present.update(_TERM_PREFIXES[m.group(1)])
+    return present
 
-    if _MONEY_RE.search(joined):
+
+# One bit per finance term plus one for currency amounts; 30 bits, so a corpus's masks fit a uint32 array.
+_TERM_BITS = {t: 1 << k for k, t in enumerate(_FINANCE_TERMS)}
+_MONEY_BIT = 1 << len(_FINANCE_TERMS)
+
+
+def _concept_mask(passage: str) -> int:
+    mask = sum(_TERM_BITS[t] for t in _finance_terms_in(passage.lower()))
+    if _MONEY_RE.search(passage):
+        mask |= _MONEY_BIT
+    return mask
+
+
+def _concept_masks(passages: List[str]) -> np.ndarray:
+    return np.fromiter((_concept_mask(p) for p in passages), dtype=np.uint32, count=len(passages))
+
+
+def _extract_financial_concepts_from_context(retrieved: List[RetrievedPassage]) -> List[str]:
+    # OR of the per-passage masks precomputed by FaissIndex, so no text is scanned per question.
+    mask = 0
+    for p in retrieved:
+        mask |= _concept_mask(p.text) if p.concepts is None else p.concepts
+
+    # stable ordering (as listed in _FINANCE_TERMS), de-duped
+    found = [term for term in _FINANCE_TERMS if mask & _TERM_BITS[term]]
+
+    if mask & _MONEY_BIT:
         found.append("currency amounts")
+    return found
+
+
+# Rough characters per token for English text under BPE tokenizers; avoids a tokenizer dependency per provider.
+_CHARS_PER_TOKEN = 4
 
-    # stable ordering, de-dupe
-    out: List[str] = []
-    seen = set()
-    for x in found:
-        if x not in seen:
-            out.append(x)
-            seen.add(x)
-    return out
 
+def _pack_context(retrieved: List[RetrievedPassage]) -> List[str]:
+    """Highest-scoring passages that fit in LLM_CONTEXT_TOKENS (default 4000, estimated from length), best first.
 
-def _build_llm_prompt(question: str, context_passages: List[str]) -> str:
-    context = "\n\n".join(context_passages)
+    Prompt prefill cost grows with context length, so this bounds latency and API cost for large top-k.
+    Exact duplicates are dropped; a top passage larger than the whole budget is truncated rather than omitted.
+    """
+    budget = int(os.getenv("LLM_CONTEXT_TOKENS", "4000")) * _CHARS_PER_TOKEN
+    packed: List[str] = []
+    seen: Set[str] = set()
+    used = 0
+    for p in sorted(retrieved, key=lambda p: p.score, reverse=True):
+        if p.text in seen:
+            continue
+        cost = len(p.text) + 2  # joined with "\n\n"
+        if used + cost > budget:
+            if not packed:
+                packed.append(p.text[:budget])
+                used = budget
+            continue
+        seen.add(p.text)
+        packed.append(p.text)
+        used += cost
+    return packed
+
+
+def _build_llm_prompt(question: str, retrieved: List[RetrievedPassage]) -> str:
+    context = "\n\n".join(_pack_context(retrieved))
     return (
         "You are a helpful PDF RAG assistant.\n"
         "- Use the provided context to answer questions about the PDF.\n"
@@ -172,48 +513,92 @@ def _build_llm_prompt(question: str, context_passages: List[str]) -> str:
     )
 
 
+def _openai_request(prompt: str) -> Tuple[Optional[str], dict]:
+    """Returns (api_key, chat.completions.create kwargs) from the OPENAI_* env vars."""
+    return os.getenv("OPENAI_API_KEY"), {
+        "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        "messages": [
+            {
+                "role": "system",
+                "content": "You answer user questions about an uploaded PDF using provided context.",
+            },
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.2,
+    }
+
+
+@lru_cache(maxsize=4)
+def _openai_client(api_key: str) -> "OpenAI":
+    """Shared per key, so its HTTP connection pool survives across questions."""
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key)
+
+
 def try_openai_chat(prompt: str) -> Optional[str]:
-    api_key = os.getenv("OPENAI_API_KEY")
+    api_key, request = _openai_request(prompt)
     if not api_key:
         return None
 
     try:
-        from openai import OpenAI
-
-        client = OpenAI(api_key=api_key)
-        resp = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You answer user questions about an uploaded PDF using provided context.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.2,
-        )
+        resp = _openai_client(api_key).chat.completions.create(**request)
         return (resp.choices[0].message.content or "").strip() or None
     except Exception:
         return None
 
 
-def try_ollama_chat(prompt: str) -> Tuple[Optional[str], Optional[str]]:
+def stream_openai_chat(prompt: str) -> Iterator[str]:
+    """Yield OpenAI answer text as it is generated. Raises on configuration/API errors."""
+    api_key, request = _openai_request(prompt)
+    if not api_key:
+        raise RuntimeError("No OPENAI_API_KEY set.")
+
+    for chunk in _openai_client(api_key).chat.completions.create(**request, stream=True):
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _ollama_request(prompt: str) -> Tuple[str, dict, int]:
+    """Returns (generate URL, JSON payload, timeout seconds) from the OLLAMA_* env vars."""
     base = os.getenv("OLLAMA_URL", "http://localhost:11434")
     model = os.getenv("OLLAMA_MODEL", "llama3.1")
     timeout_s = int(os.getenv("OLLAMA_TIMEOUT", "180"))
     max_tokens = int(os.getenv("OLLAMA_MAX_TOKENS", "256"))
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": False,
+        "options": {"num_predict": max_tokens},
+    }
+    return f"{base}/api/generate", payload, timeout_s
+
+
+def _pooled_session() -> requests.Session:
+    """Keep-alive session with a larger connection pool and light retries on connection errors."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=64,
+        # Only retry failed connects: a read timeout on /api/generate must not resubmit a long generation. read=False
+        # (requests' own default) re-raises read errors as-is instead of wrapping them in MaxRetryError.
+        max_retries=Retry(total=2, connect=2, read=False, status=0, backoff_factor=0.2, allowed_methods=None),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Module-level so repeated Ollama calls reuse TCP connections instead of reconnecting each time.
+_OLLAMA_SESSION = _pooled_session()
+_OLLAMA_ASYNC_LIMITS = {"max_connections": 64, "max_keepalive_connections": 32}
+
+
+def try_ollama_chat(prompt: str) -> Tuple[Optional[str], Optional[str]]:
+    url, payload, timeout_s = _ollama_request(prompt)
 
     try:
-        r = requests.post(
-            f"{base}/api/generate",
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {"num_predict": max_tokens},
-            },
-            timeout=timeout_s,
-        )
+        r = _OLLAMA_SESSION.post(url, json=payload, timeout=timeout_s)
         if r.status_code != 200:
             return None, f"HTTP {r.status_code}: {r.text[:300]}"
         data = r.json()
@@ -223,27 +608,56 @@ def try_ollama_chat(prompt: str) -> Tuple[Optional[str], Optional[str]]:
         return None, str(e)
 
 
+def stream_ollama_chat(prompt: str) -> Iterator[str]:
+    """Yield Ollama answer text as it is generated (NDJSON stream). Raises on HTTP/connection errors."""
+    url, payload, timeout_s = _ollama_request(prompt)
+    payload["stream"] = True
+
+    with _OLLAMA_SESSION.post(url, json=payload, timeout=timeout_s, stream=True) as r:
+        if r.status_code != 200:
+            raise RuntimeError(f"HTTP {r.status_code}: {r.text[:300]}")
+        for line in r.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line)
+            if data.get("error"):
+                raise RuntimeError(data["error"])
+            if data.get("response"):
+                yield data["response"]
+            if data.get("done"):
+                break
+
+
+def _gemini_request() -> Tuple[Optional[str], str, dict]:
+    """Returns (api_key, model, generation config) from the GEMINI_* env vars."""
+    api_key = os.getenv("GEMINI_API_KEY", "") or None
+    model = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+    config = {
+        "max_output_tokens": int(os.getenv("GEMINI_MAX_TOKENS", "1024")),
+        "temperature": float(os.getenv("GEMINI_TEMPERATURE", "0.2")),
+    }
+    return api_key, model, config
+
+
+@lru_cache(maxsize=4)
+def gemini_client(api_key: str) -> "genai.Client":
+    """Shared per key by the sync calls and the app's sidebar probe (the async path manages its own, see answer_many)."""
+    from google import genai
+
+    return genai.Client(api_key=api_key)
+
+
 def try_gemini_chat(prompt: str) -> Tuple[Optional[str], Optional[str]]:
     """Call Google Gemini 2.5 Flash. Returns (answer, error_msg)."""
-    api_key = os.getenv("GEMINI_API_KEY", "")
+    api_key, model, config = _gemini_request()
     if not api_key:
         return None, "No GEMINI_API_KEY set."
 
-    model = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-    max_tokens = int(os.getenv("GEMINI_MAX_TOKENS", "1024"))
-    temperature = float(os.getenv("GEMINI_TEMPERATURE", "0.2"))
-
     try:
-        from google import genai
-
-        client = genai.Client(api_key=api_key)
-        response = client.models.generate_content(
+        response = gemini_client(api_key).models.generate_content(
             model=model,
             contents=prompt,
-            config={
-                "max_output_tokens": max_tokens,
-                "temperature": temperature,
-            },
+            config=config,
         )
         text = (response.text or "").strip()
         return (text or None), None
@@ -251,53 +665,45 @@ def try_gemini_chat(prompt: str) -> Tuple[Optional[str], Optional[str]]:
         return None, str(e)
 
 
-def answer_with_llm_or_extract(question: str, retrieved: List[RetrievedPassage]) -> Tuple[str, bool]:
-    """Returns (answer, used_llm)."""
-    q = normalize_user_question(question)
-    context = [p.text for p in retrieved]
+def stream_gemini_chat(prompt: str) -> Iterator[str]:
+    """Yield Gemini answer text as it is generated. Raises on configuration/API errors."""
+    api_key, model, config = _gemini_request()
+    if not api_key:
+        raise RuntimeError("No GEMINI_API_KEY set.")
+
+    client = gemini_client(api_key)
+    for chunk in client.models.generate_content_stream(model=model, contents=prompt, config=config):
+        if chunk.text:
+            yield chunk.text
 
+
+def _direct_answer(q: str, retrieved: List[RetrievedPassage]) -> Optional[str]:
+    """Answers produced by intent heuristics, without calling an LLM."""
+    ql = q.lower()
     # Intent heuristic 1: underspecified summary => ask a targeted clarifying question.
-    if _summary_is_underspecified(q):
+    if _summary_is_underspecified_ql(ql):
         return (
             "Do you want a summary of the whole PDF, or a specific section/pages? "
-            "Also, should it be short (5 bullets) or detailed (1–2 paragraphs)?",
-            False,
+            "Also, should it be short (5 bullets) or detailed (1–2 paragraphs)?"
         )
 
     # Intent heuristic 2: “financial concepts” => answer directly from retrieved context when possible.
-    if _looks_like_financial_concepts_question(q):
-        concepts = _extract_financial_concepts_from_context(context)
+    if _looks_like_financial_concepts_ql(ql):
+        concepts = _extract_financial_concepts_from_context(retrieved)
         if concepts:
             concepts_txt = ", ".join(concepts[:10])
             return (
                 "Yes — I see financial-related content in the retrieved parts of the PDF. "
                 f"Examples of financial concepts/terms mentioned: {concepts_txt}. "
-                "If you want, tell me whether you mean *accounting terms*, *financial statements*, or *finance theory*, and I’ll narrow it down.",
-                False,
+                "If you want, tell me whether you mean *accounting terms*, *financial statements*, or *finance theory*, and I’ll narrow it down."
             )
+    return None
 
-    prompt = _build_llm_prompt(q or question, context)
-
-    provider = os.getenv("LLM_PROVIDER", "None")
-    llm_error = None
-
-    if provider == "Gemini":
-        ans, llm_error = try_gemini_chat(prompt)
-        if ans:
-            return ans, True
-    elif provider == "OpenAI":
-        ans = try_openai_chat(prompt)
-        if ans:
-            return ans, True
-        llm_error = "OpenAI call failed. Check your API key."
-    elif provider == "Ollama":
-        ans, llm_error = try_ollama_chat(prompt)
-        if ans:
-            return ans, True
 
+def _fallback_answer(provider: str, retrieved: List[RetrievedPassage], llm_error: Optional[str]) -> str:
     # Fallback: extractive
     if not retrieved:
-        return "I couldn't find anything relevant in the PDF.", False
+        return "I couldn't find anything relevant in the PDF."
 
     top = "\n\n".join([p.text for p in retrieved[:3]])
     if provider == "None" or not provider:
@@ -312,4 +718,359 @@ def answer_with_llm_or_extract(question: str, retrieved: List[RetrievedPassage])
         if llm_error:
             fallback_msg += f"\n\nError: {llm_error}"
         fallback_msg += "\n\nRelevant passages:\n\n" + top
-    return fallback_msg, False
+    return fallback_msg
+
+
+class _AnswerCache:
+    """LLM answers keyed by request fingerprint: in-memory LRU, plus SQLite at ANSWER_CACHE_PATH if set.
+
+    Entries older than ANSWER_CACHE_TTL seconds (default 3600) are ignored. Only successful answers are stored.
+    """
+
+    def __init__(self, path: Optional[str], *, maxsize: int = 256, ttl_s: float = 3600.0) -> None:
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._maxsize = maxsize
+        self._ttl_s = ttl_s
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, created REAL NOT NULL, answer TEXT NOT NULL)"
+                )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is None and self._conn is not None:
+                row = self._conn.execute("SELECT created, answer FROM answers WHERE key = ?", (key,)).fetchone()
+                hit = (row[0], row[1]) if row else None
+            if hit is None or now - hit[0] > self._ttl_s:
+                return None
+            self._remember(key, hit)
+            return hit[1]
+
+    def put(self, key: str, answer: str) -> None:
+        entry = (time.time(), answer)
+        with self._lock:
+            self._remember(key, entry)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO answers (key, created, answer) VALUES (?, ?, ?)", (key, *entry)
+                    )
+
+    def _remember(self, key: str, entry: Tuple[float, str]) -> None:
+        # caller holds self._lock
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self._maxsize:
+            self._mem.popitem(last=False)
+
+
+@lru_cache(maxsize=1)
+def _answer_cache() -> _AnswerCache:
+    return _AnswerCache(os.getenv("ANSWER_CACHE_PATH"), ttl_s=float(os.getenv("ANSWER_CACHE_TTL", "3600")))
+
+
+def _answer_cache_key(provider: str, prompt: str) -> Optional[str]:
+    """Fingerprint of everything that shapes the answer: provider, model, generation settings, prompt."""
+    if provider == "OpenAI":
+        desc: object = _openai_request(prompt)[1]
+    elif provider == "Ollama":
+        url, payload, _timeout = _ollama_request(prompt)
+        desc = {"url": url, **payload}
+    elif provider == "Gemini":
+        _key, model, config = _gemini_request()
+        desc = {"model": model, "config": config, "prompt": prompt}
+    else:
+        return None
+    blob = json.dumps([provider, desc], sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+
+def _call_llm(provider: str, prompt: str) -> Tuple[Optional[str], Optional[str]]:
+    """Blocking call to the selected provider, through the answer cache. Returns (answer, error_msg)."""
+    key = _answer_cache_key(provider, prompt)
+    cached = _answer_cache().get(key) if key else None
+    if cached:
+        return cached, None
+    ans, err = _call_llm_uncached(provider, prompt)
+    if ans and key:
+        _answer_cache().put(key, ans)
+    return ans, err
+
+
+def _call_llm_uncached(provider: str, prompt: str) -> Tuple[Optional[str], Optional[str]]:
+    if provider == "Gemini":
+        return try_gemini_chat(prompt)
+    if provider == "OpenAI":
+        ans = try_openai_chat(prompt)
+        return (ans, None) if ans else (None, "OpenAI call failed. Check your API key.")
+    if provider == "Ollama":
+        return try_ollama_chat(prompt)
+    return None, None
+
+
+def answer_with_llm_or_extract(question: str, retrieved: List[RetrievedPassage]) -> Tuple[str, bool]:
+    """Returns (answer, used_llm)."""
+    q = normalize_user_question(question)
+
+    direct = _direct_answer(q, retrieved)
+    if direct is not None:
+        return direct, False
+
+    prompt = _build_llm_prompt(q or question, retrieved)
+
+    provider = os.getenv("LLM_PROVIDER", "None")
+    ans, llm_error = _call_llm(provider, prompt)
+    if ans:
+        return ans, True
+    return _fallback_answer(provider, retrieved, llm_error), False
+
+
+_STREAMERS = {
+    "Gemini": stream_gemini_chat,
+    "OpenAI": stream_openai_chat,
+    "Ollama": stream_ollama_chat,
+}
+
+
+class AnswerStream:
+    """Streaming counterpart of answer_with_llm_or_extract.
+
+    Iterate it (e.g. with ``st.write_stream``) to receive the answer in chunks; ``used_llm`` is final once
+    iteration has finished. Answers are streamed token by token from every provider, so the first words show up
+    after one decode step instead of after the whole generation.
+    """
+
+    def __init__(self, question: str, retrieved: List[RetrievedPassage]) -> None:
+        self._question = question
+        self._retrieved = retrieved
+        self.used_llm = False
+
+    def __iter__(self) -> Iterator[str]:
+        q = normalize_user_question(self._question)
+
+        direct = _direct_answer(q, self._retrieved)
+        if direct is not None:
+            yield direct
+            return
+
+        prompt = _build_llm_prompt(q or self._question, self._retrieved)
+        provider = os.getenv("LLM_PROVIDER", "None")
+
+        llm_error = None
+        streamer = _STREAMERS.get(provider)
+        if streamer is not None:
+            key = _answer_cache_key(provider, prompt)
+            cached = _answer_cache().get(key) if key else None
+            if cached:
+                self.used_llm = True
+                yield cached
+                return
+
+            pieces: List[str] = []
+            try:
+                for piece in streamer(prompt):
+                    self.used_llm = True
+                    pieces.append(piece)
+                    yield piece
+            except Exception as e:
+                if self.used_llm:
+                    yield f"\n\n_({provider} stream interrupted: {e})_"
+                    return
+                llm_error = str(e)
+            if self.used_llm:
+                answer = "".join(pieces).strip()
+                if answer and key:
+                    _answer_cache().put(key, answer)
+                return
+
+        yield _fallback_answer(provider, self._retrieved, llm_error)
+
+
+# Async variants: same contracts as the sync helpers above, for answering many questions concurrently (see answer_many).
+# Ollama only runs requests in parallel up to its server-side OLLAMA_NUM_PARALLEL setting; extra requests queue.
+# Async clients are not cached like the sync ones: their connections are bound to the event loop that opened them,
+# and callers typically run a fresh loop per batch. answer_many opens one per provider for the whole batch instead;
+# single calls open and close their own.
+
+
+async def try_openai_chat_async(prompt: str, *, client: Optional["AsyncOpenAI"] = None) -> Optional[str]:
+    """client lets callers share one connection pool across concurrent requests."""
+    api_key, request = _openai_request(prompt)
+    if not api_key:
+        return None
+
+    try:
+        if client is None:
+            from openai import AsyncOpenAI
+
+            async with AsyncOpenAI(api_key=api_key) as own_client:
+                resp = await own_client.chat.completions.create(**request)
+        else:
+            resp = await client.chat.completions.create(**request)
+        return (resp.choices[0].message.content or "").strip() or None
+    except Exception:
+        return None
+
+
+async def try_ollama_chat_async(
+    prompt: str, *, client: Optional["httpx.AsyncClient"] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """client lets callers share one connection pool across concurrent requests."""
+    import httpx
+
+    url, payload, timeout_s = _ollama_request(prompt)
+
+    try:
+        if client is None:
+            async with httpx.AsyncClient(limits=httpx.Limits(**_OLLAMA_ASYNC_LIMITS)) as own_client:
+                r = await own_client.post(url, json=payload, timeout=timeout_s)
+        else:
+            r = await client.post(url, json=payload, timeout=timeout_s)
+        if r.status_code != 200:
+            return None, f"HTTP {r.status_code}: {r.text[:300]}"
+        data = r.json()
+        out = (data.get("response") or "").strip()
+        return (out or None), None
+    except Exception as e:
+        return None, str(e)
+
+
+@asynccontextmanager
+async def _gemini_aio(api_key: str) -> AsyncIterator["genai.client.AsyncClient"]:
+    """A genai client's async side, closed (with its sync side) on exit."""
+    from google import genai
+
+    with genai.Client(api_key=api_key) as client:
+        async with client.aio as aio:
+            yield aio
+
+
+async def try_gemini_chat_async(
+    prompt: str, *, aio: Optional["genai.client.AsyncClient"] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """aio (a genai.Client(...).aio) lets callers share one connection pool across concurrent requests."""
+    api_key, model, config = _gemini_request()
+    if not api_key:
+        return None, "No GEMINI_API_KEY set."
+
+    try:
+        if aio is None:
+            async with _gemini_aio(api_key) as own_aio:
+                response = await own_aio.models.generate_content(model=model, contents=prompt, config=config)
+        else:
+            response = await aio.models.generate_content(model=model, contents=prompt, config=config)
+        text = (response.text or "").strip()
+        return (text or None), None
+    except Exception as e:
+        return None, str(e)
+
+
+async def _call_llm_async(
+    provider: str,
+    prompt: str,
+    *,
+    ollama_client: Optional["httpx.AsyncClient"] = None,
+    openai_client: Optional["AsyncOpenAI"] = None,
+    gemini_aio: Optional["genai.client.AsyncClient"] = None,
+) -> Tuple[Optional[str], Optional[str]]:
+    key = _answer_cache_key(provider, prompt)
+    cached = _answer_cache().get(key) if key else None
+    if cached:
+        return cached, None
+    ans, err = await _call_llm_async_uncached(
+        provider, prompt, ollama_client=ollama_client, openai_client=openai_client, gemini_aio=gemini_aio
+    )
+    if ans and key:
+        _answer_cache().put(key, ans)
+    return ans, err
+
+
+async def _call_llm_async_uncached(
+    provider: str,
+    prompt: str,
+    *,
+    ollama_client: Optional["httpx.AsyncClient"] = None,
+    openai_client: Optional["AsyncOpenAI"] = None,
+    gemini_aio: Optional["genai.client.AsyncClient"] = None,
+) -> Tuple[Optional[str], Optional[str]]:
+    if provider == "Gemini":
+        return await try_gemini_chat_async(prompt, aio=gemini_aio)
+    if provider == "OpenAI":
+        ans = await try_openai_chat_async(prompt, client=openai_client)
+        return (ans, None) if ans else (None, "OpenAI call failed. Check your API key.")
+    if provider == "Ollama":
+        return await try_ollama_chat_async(prompt, client=ollama_client)
+    return None, None
+
+
+async def answer_with_llm_or_extract_async(
+    question: str,
+    retrieved: List[RetrievedPassage],
+    *,
+    ollama_client: Optional["httpx.AsyncClient"] = None,
+    openai_client: Optional["AsyncOpenAI"] = None,
+    gemini_aio: Optional["genai.client.AsyncClient"] = None,
+) -> Tuple[str, bool]:
+    """Async answer_with_llm_or_extract. Returns (answer, used_llm).
+
+    The client arguments share a connection pool across concurrent calls; when None, the call opens and closes its own.
+    """
+    q = normalize_user_question(question)
+
+    direct = _direct_answer(q, retrieved)
+    if direct is not None:
+        return direct, False
+
+    prompt = _build_llm_prompt(q or question, retrieved)
+
+    provider = os.getenv("LLM_PROVIDER", "None")
+    ans, llm_error = await _call_llm_async(
+        provider, prompt, ollama_client=ollama_client, openai_client=openai_client, gemini_aio=gemini_aio
+    )
+    if ans:
+        return ans, True
+    return _fallback_answer(provider, retrieved, llm_error), False
+
+
+async def answer_many(
+    questions: List[str], retrieveds: List[List[RetrievedPassage]]
+) -> List[Tuple[str, bool]]:
+    """Answer several questions concurrently; results are in input order."""
+    if len(questions) != len(retrieveds):
+        raise ValueError("questions and retrieveds must have same length")
+
+    import httpx
+
+    provider = os.getenv("LLM_PROVIDER", "None")
+    # One client (connection pool) per provider for the whole batch, closed when it is done.
+    async with AsyncExitStack() as stack:
+        ollama_client = await stack.enter_async_context(
+            httpx.AsyncClient(limits=httpx.Limits(**_OLLAMA_ASYNC_LIMITS))
+        )
+        openai_client = gemini_aio = None
+        try:
+            if provider == "OpenAI" and os.getenv("OPENAI_API_KEY"):
+                from openai import AsyncOpenAI
+
+                openai_client = await stack.enter_async_context(AsyncOpenAI(api_key=os.environ["OPENAI_API_KEY"]))
+            elif provider == "Gemini" and os.getenv("GEMINI_API_KEY"):
+                gemini_aio = await stack.enter_async_context(_gemini_aio(os.environ["GEMINI_API_KEY"]))
+        except Exception:
+            pass  # SDK missing or misconfigured: each call reports its own error
+        return list(
+            await asyncio.gather(
+                *[
+                    answer_with_llm_or_extract_async(
+                        q, r, ollama_client=ollama_client, openai_client=openai_client, gemini_aio=gemini_aio
+                    )
+                    for q, r in zip(questions, retrieveds)
+                ]
+            )
+        )